@@ -1,5 +1,16 @@
+import json
+
 from loguru import logger
 
+from core.schemas import (
+    ACTION_SCHEMA_HINT,
+    ActionPlan,
+    is_valid_output,
+    known_owners_line,
+    parse_structured_output,
+    render_action_plan,
+)
+
 
 class ActionAgent:
     """
@@ -7,44 +18,103 @@ class ActionAgent:
     Translates impact analysis into actionable next steps for compliance teams.
     """
 
-    def __init__(self, llm_client):
+    # Rough size of one JSON action plan, reserved per item when batching requests
+    PLAN_TOKENS = 400
+
+    def __init__(self, llm_client, control_registry=None):
         self.llm_client = llm_client
+        # Owners of registered controls; action owners are normalised onto this list
+        self.control_registry = control_registry
+
+    def _known_owners(self):
+        return self.control_registry.owners() if self.control_registry else []
 
     def generate_recommendations(self, impact_summary):
         """Generate prioritized compliance actions based on the impact summary."""
         title = impact_summary.get("regulation_title", "Unknown Regulation")
         logger.info(f"🧭 Generating recommendations for: {title}")
 
-        impact_text = impact_summary.get("impact_analysis", "No impact summary provided.")
+        owners = self._known_owners()
+        prompt = self._build_prompt(impact_summary, owners)
 
-        prompt = f"""
-You are a senior compliance officer at a UK financial institution.
-Based on the following impact analysis, propose specific, practical actions
-the compliance and operations teams should take.
+        try:
+            # ✅ Correct method call
+            result_text = self.llm_client.generate_text(prompt)
+        except Exception as e:
+            logger.error(f"Error generating recommendations: {e}")
+            result_text = None
 
-Impact Analysis:
-{impact_text}
+        return self._package(title, result_text, owners)
 
-Provide output as a clear action plan with the following sections:
-1. Action Item
-2. Priority (High / Medium / Low)
-3. Responsible Owner or Department
-4. Target Completion Timeline
-5. Rationale
-"""
+    def generate_recommendations_batch(self, impact_summaries):
+        """Generate recommendations for several impact summaries, batching LLM calls when enabled."""
+        if not self.llm_client.batching_enabled:
+            return [self.generate_recommendations(impact) for impact in impact_summaries]
+
+        logger.info(f"🧭 Generating recommendations for {len(impact_summaries)} regulations in batched mode...")
+        owners = self._known_owners()
+        prompts = [self._build_prompt(impact, owners) for impact in impact_summaries]
 
         try:
-            # ✅ Correct method call
-            result_text = self.llm_client.generate_text(prompt)
+            results = self.llm_client.generate_batch(
+                prompts, validate=lambda text: self._is_valid_response(text, owners), output_tokens=self.PLAN_TOKENS
+            )
+        except Exception as e:
+            logger.error(f"Error generating batched recommendations: {e}")
+            results = [None] * len(impact_summaries)
+
+        return [
+            self._package(impact.get("regulation_title", "Unknown Regulation"), result_text, owners)
+            for impact, result_text in zip(impact_summaries, results)
+        ]
+
+    @staticmethod
+    def _is_valid_response(result_text, owners=None):
+        return is_valid_output(result_text, ActionPlan, {"owners": owners})
 
-            if not result_text or "Error" in result_text:
-                raise ValueError("Invalid or empty LLM response")
+    @staticmethod
+    def _package(title, result_text, owners=None):
+        """Validate the LLM's JSON action plan (owners normalised onto known owners) and render it."""
+        try:
+            plan = parse_structured_output(result_text, ActionPlan, {"owners": owners})
+            recommended_actions = render_action_plan(plan)
+            action_items = [item.model_dump() for item in plan.actions]
 
         except Exception as e:
-            logger.error(f"Error generating recommendations: {e}")
-            result_text = "Error generating recommendations."
+            logger.error(f"Error generating recommendations for {title}: {e}")
+            recommended_actions = "Error generating recommendations."
+            action_items = []
 
         return {
             "regulation_title": title,
-            "recommended_actions": result_text
+            "recommended_actions": recommended_actions,
+            "action_items": action_items
         }
+
+    @staticmethod
+    def _build_prompt(impact_summary, owners=None):
+        # Prefer the structured assessment so gaps keep their linked control ids
+        structured = impact_summary.get("impact")
+        impact_text = (
+            json.dumps(structured, indent=2) if structured
+            else impact_summary.get("impact_analysis", "No impact summary provided.")
+        )
+        # Listing the known owners keeps one team from appearing under several names
+        owner_hint = (
+            "Use exactly one of the known owners below for each action, spelled as listed.\n"
+            f"{known_owners_line(owners)}\n"
+        ) if owners else ""
+
+        return f"""
+You are a senior compliance officer at a UK financial institution.
+Based on the following impact analysis, propose specific, practical actions
+the compliance and operations teams should take.
+
+Impact Analysis:
+{impact_text}
+
+Respond with a single JSON object only, matching this schema:
+{ACTION_SCHEMA_HINT}
+Each action needs a priority (High / Medium / Low), a responsible owner or department,
+a target completion deadline and a short rationale.
+{owner_hint}"""
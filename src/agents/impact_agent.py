@@ -1,5 +1,7 @@
 from loguru import logger
 
+from core.schemas import IMPACT_SCHEMA_HINT, ImpactAssessment, parse_structured_output, render_impact
+
 
 class ImpactAgent:
     """
@@ -18,8 +20,8 @@ class ImpactAgent:
         regulation_text = mapping.get("regulation_text", "")
         related_items = mapping.get("related_policies_controls", [])
 
-        # Build concise context for LLM
-        context = "\n".join([f"- {item['text']}" for item in related_items]) or "No related policies found."
+        # Build concise context for LLM, tagging controls with their ids so gaps can link to them
+        context = "\n".join([self._format_related_item(item) for item in related_items]) or "No related policies found."
 
         # Build a domain-specific prompt
         prompt = f"""
@@ -32,24 +34,33 @@ Regulation:
 Related Internal Policies & Controls:
 {context}
 
-Provide the output in three clear sections:
-1. Impact Summary
-2. Identified Gaps
-3. Recommended Focus Areas
+Respond with a single JSON object only, matching this schema:
+{IMPACT_SCHEMA_HINT}
+List in control_ids the ids (shown in square brackets above) of the controls each gap relates to.
 """
 
         try:
             # ✅ Corrected call — use the actual method in LLMClient
             result_text = self.llm_client.generate_text(prompt)
+            # Gaps may only cite controls that were actually retrieved for this regulation
+            known_ids = {(item.get("metadata") or {}).get("control_id") for item in related_items} - {None}
+            assessment = parse_structured_output(result_text, ImpactAssessment, context={"control_ids": known_ids})
 
-            if not result_text or "Error" in result_text:
-                raise ValueError("Invalid or empty LLM response")
+            result_text = render_impact(assessment)
+            structured = assessment.model_dump()
 
         except Exception as e:
             logger.error(f"Error generating impact summary: {e}")
             result_text = "Error generating impact summary."
+            structured = None
 
         return {
             "regulation_title": mapping.get("regulation_title", "Unknown Regulation"),
-            "impact_analysis": result_text
+            "impact_analysis": result_text,
+            "impact": structured
         }
+
+    @staticmethod
+    def _format_related_item(item):
+        control_id = (item.get("metadata") or {}).get("control_id")
+        return f"- [{control_id}] {item['text']}" if control_id else f"- {item['text']}"
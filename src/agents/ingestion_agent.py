@@ -5,6 +5,8 @@ Fetches, processes, summarizes, and caches FCA/PRA regulatory updates.
 
 import os
 import json
+import hashlib
+from datetime import datetime
 from loguru import logger
 from bs4 import BeautifulSoup
 import requests
@@ -21,26 +23,19 @@ class IngestionAgent:
             "https://www.bankofengland.co.uk/prudential-regulation/publication/2024/july/pra-annual-report-2023-24"
         ]
 
-        # ✅ Cache file location
-        self.cache_file = "./src/data/output/summarized_regulations.json"
+        # ✅ Summary cache: one file per document, keyed by a hash of its source text
+        self.cache_dir = "./src/data/output/summaries"
 
     def fetch_latest_updates(self):
         """Fetch, summarize, and store the latest regulatory updates."""
-        logger.info(f"📥 Starting ingestion in mode: {self.mode}")
+        return self.summarize_documents(self.fetch_documents())
 
-        # ✅ Skip cache if forced
-        if not self.force_refresh:
-            # ✅ Load from cache if available
-            cached_docs = self._load_from_cache()
-            if cached_docs:
-                logger.info(f"💾 Loaded {len(cached_docs)} summarized documents from cache.")
-                return cached_docs
-            else:
-                logger.info("⚠️ No valid cache found — fetching new data.")
-        else:
-            logger.info("♻️ Force refresh enabled — skipping cache.")
+    def fetch_documents(self):
+        """Fetch raw regulatory updates (not yet summarized), each tagged with a hash of its source text."""
+        logger.info(f"📥 Starting ingestion in mode: {self.mode}")
+        if self.force_refresh:
+            logger.info("♻️ Force refresh enabled — cached summaries will be ignored.")
 
-        # Otherwise fetch fresh data
         if self.mode == "live":
             raw_docs = self._fetch_from_web()
         else:
@@ -50,51 +45,94 @@ class IngestionAgent:
             logger.warning("No new regulatory documents found.")
             return []
 
+        for doc in raw_docs:
+            content = doc.get("content", doc.get("title", "Untitled Regulation"))
+            doc["source_hash"] = hashlib.sha1(content.encode("utf-8")).hexdigest()
+        return raw_docs
+
+    def summarize_document(self, doc):
+        """Summarize one fetched document (see summarize_documents)."""
+        return self.summarize_documents([doc])[0]
+
+    def summarize_documents(self, raw_docs):
+        """
+        Summarize fetched documents, reusing cached summaries of unchanged source text.
+        Failed documents come back as error entries and are not cached, so they are retried next run.
+        """
+        cached = {} if self.force_refresh else {
+            i: self._load_from_cache(doc["source_hash"]) for i, doc in enumerate(raw_docs)
+        }
+        pending = [i for i, doc in enumerate(raw_docs) if not cached.get(i)]
+        if len(pending) < len(raw_docs):
+            logger.info(f"💾 Loaded {len(raw_docs) - len(pending)} summarized documents from cache.")
+
+        # ✅ Pack small documents into shared LLM requests when batching is enabled
+        summaries = {}
+        if self.llm_client.batching_enabled and len(pending) > 1:
+            logger.info(f"📦 Summarizing {len(pending)} documents in batched mode...")
+            contents = [self._content(raw_docs[i]) for i in pending]
+            summaries = dict(zip(pending, self.llm_client.summarize_batch(contents, max_length=250)))
+
         summarized_docs = []
+        now = datetime.now().isoformat(timespec="seconds")
+        for i, doc in enumerate(raw_docs):
+            if cached.get(i):
+                entry = cached[i]
+                summarized_docs.append(self._summarized_doc(doc, entry["summary"], entry["ingested_at"]))
+                continue
 
-        # ✅ Summarize each document using the LLM
-        for doc in raw_docs:
             title = doc.get("title", "Untitled Regulation")
-            content = doc.get("content", title)  # fallback if only title is available
-            doc_id = doc.get("id", f"doc_{hash(title)}")
-            source = doc.get("source", "Unknown")
-
             try:
-                logger.info(f"🧾 Summarizing document: {title[:60]}...")
+                summary = summaries.get(i)
+                if summary is None:
+                    logger.info(f"🧾 Summarizing document: {title[:60]}...")
 
-                summary = self.llm_client.summarize_text(
-                    content,
-                    max_length=250
-                )
+                    summary = self.llm_client.summarize_text(
+                        self._content(doc),
+                        max_length=250
+                    )
 
-                summarized_doc = {
-                    "id": doc_id,
-                    "regulation_title": title,
-                    "regulation_text": summary,
-                    "title": title,
-                    "content": summary,
-                    "source": source
-                }
+                # Don't cache failed or empty answers as summaries
+                if not self.llm_client.is_valid_text(summary):
+                    raise ValueError("Invalid or empty LLM summary")
 
-                summarized_docs.append(summarized_doc)
+                summarized_doc = self._summarized_doc(doc, summary, now)
+                self._save_to_cache(summarized_doc)
                 # Optionally, store summarized version in retriever
-                self.retriever.add_document(doc_id, summary, {"source": source})
+                self.retriever.add_document(summarized_doc["id"], summary, {"source": summarized_doc["source"]})
+                summarized_docs.append(summarized_doc)
 
             except Exception as e:
                 logger.error(f"❌ Error summarizing {title}: {e}")
                 summarized_docs.append({
-                    "id": doc_id,
-                    "regulation_title": title,
-                    "regulation_text": "Error summarizing document.",
-                    "source": source
+                    **self._summarized_doc(doc, "Error summarizing document.", now),
+                    "content": self._content(doc)
                 })
 
-        # ✅ Save summarized results to cache
-        self._save_to_cache(summarized_docs)
-
-        logger.info(f"✅ Successfully summarized and cached {len(summarized_docs)} documents.")
+        failed = sum(1 for d in summarized_docs if d["regulation_text"] == "Error summarizing document.")
+        if failed:
+            logger.warning(f"⚠️ {failed} documents failed to summarize and will be retried next run.")
+        logger.info(f"✅ Summarized {len(summarized_docs) - failed} of {len(summarized_docs)} documents.")
         return summarized_docs
 
+    def _summarized_doc(self, doc, summary, ingested_at):
+        title = doc.get("title", "Untitled Regulation")
+        return {
+            "id": doc.get("id", self._stable_id(title)),
+            "regulation_title": title,
+            "regulation_text": summary,
+            "title": title,
+            "content": summary,
+            "source": doc.get("source", "Unknown"),
+            "source_hash": doc["source_hash"],
+            # Cached summaries keep their date, so unchanged regulations keep their original ingestion date
+            "ingested_at": ingested_at
+        }
+
+    @staticmethod
+    def _content(doc):
+        return doc.get("content", doc.get("title", "Untitled Regulation"))  # fallback if only title is available
+
     # ---------------------------
     # Internal fetchers
     # ---------------------------
@@ -133,7 +171,7 @@ class IngestionAgent:
                 # Extract some visible text or headlines
                 titles = [a.text.strip() for a in soup.find_all("a") if a.text.strip()]
                 for t in titles[:3]:  # limit to 3 per source
-                    doc_id = f"doc_{hash(t)}"
+                    doc_id = self._stable_id(t)
                     self.retriever.add_document(doc_id, t, {"source": url})
                     new_docs.append({
                         "id": doc_id,
@@ -148,27 +186,40 @@ class IngestionAgent:
         logger.info(f"🌐 Fetched {len(new_docs)} live documents from the web.")
         return new_docs
 
+    @staticmethod
+    def _stable_id(text):
+        """Document id that stays the same across processes (unlike hash())."""
+        return f"doc_{hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]}"
+
     # ------------------------------------------------------------------
     # Cache utilities
     # ------------------------------------------------------------------
-    def _load_from_cache(self):
-        """Load summarized docs if cache file exists."""
-        if os.path.exists(self.cache_file):
+    def _cache_path(self, source_hash):
+        return os.path.join(self.cache_dir, f"{source_hash}.json")
+
+    def _load_from_cache(self, source_hash):
+        """Load the cached summary for a source text, if any."""
+        cache_path = self._cache_path(source_hash)
+        if os.path.exists(cache_path):
             try:
-                with open(self.cache_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if isinstance(data, list) and len(data) > 0:
-                        return data
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                    if entry.get("summary"):
+                        return entry
             except Exception as e:
-                logger.error(f"⚠️ Error reading cache file: {e}")
+                logger.error(f"⚠️ Error reading cache file {cache_path}: {e}")
         return None
 
-    def _save_to_cache(self, summarized_docs):
-        """Persist summarized documents to JSON cache."""
+    def _save_to_cache(self, summarized_doc):
+        """Persist one document's summary to the JSON cache."""
         try:
-            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
-            with open(self.cache_file, "w", encoding="utf-8") as f:
-                json.dump(summarized_docs, f, indent=2)
-            logger.info(f"💾 Saved summarized docs to cache: {self.cache_file}")
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry = {
+                "source_hash": summarized_doc["source_hash"],
+                "summary": summarized_doc["regulation_text"],
+                "ingested_at": summarized_doc["ingested_at"]
+            }
+            with open(self._cache_path(summarized_doc["source_hash"]), "w", encoding="utf-8") as f:
+                json.dump(entry, f, indent=2)
         except Exception as e:
             logger.error(f"⚠️ Error saving cache: {e}")
@@ -16,29 +16,30 @@ class MappingAgent:
         """Map each new regulation to potentially related policies and controls."""
         logger.info("🗺️ Mapping new regulations to internal policies and controls...")
 
-        mappings = []
+        mappings = [self.map_regulation(doc) for doc in regulatory_docs]
 
-        for doc in regulatory_docs:
-            title = doc.get("title", "Untitled Regulation")
-            content = doc.get("content", "")
+        logger.success(f"✅ Completed mapping for {len(mappings)} regulatory updates.")
+        return mappings
 
-            query = f"Find internal policies and controls related to this regulation: {title}\n\n{content}"
+    def map_regulation(self, doc):
+        """Map a single regulation to its most relevant policies and controls."""
+        title = doc.get("title", "Untitled Regulation")
+        content = doc.get("content", "")
 
-            # Semantic search against stored internal docs
-            results = self.retriever.search(query, top_k=5)
+        query = f"Find internal policies and controls related to this regulation: {title}\n\n{content}"
 
-            # Simplify structure for downstream agents
-            related_items = []
-            if results and "documents" in results:
-                for i, doc_text in enumerate(results["documents"][0]):
-                    meta = results["metadatas"][0][i] if "metadatas" in results else {}
-                    related_items.append({"text": doc_text, "metadata": meta})
+        # Semantic search against stored internal docs
+        results = self.retriever.search(query, top_k=5)
 
-            mappings.append({
-                "regulation_title": title,
-                "regulation_text": content,
-                "related_policies_controls": related_items
-            })
+        # Simplify structure for downstream agents
+        related_items = []
+        if results and "documents" in results:
+            for i, doc_text in enumerate(results["documents"][0]):
+                meta = results["metadatas"][0][i] if "metadatas" in results else {}
+                related_items.append({"text": doc_text, "metadata": meta})
 
-        logger.success(f"✅ Completed mapping for {len(mappings)} regulatory updates.")
-        return mappings
+        return {
+            "regulation_title": title,
+            "regulation_text": content,
+            "related_policies_controls": related_items
+        }
@@ -0,0 +1,185 @@
+"""
+Control Registry Module
+In-process index of internal controls with owner / frequency / review-date
+lookups and a reverse index from control_id to the regulations mapped to it.
+"""
+
+import bisect
+import hashlib
+import json
+from datetime import datetime
+
+from loguru import logger
+
+
+class ControlRegistry:
+    def __init__(self):
+        self.controls = {}  # control_id -> control record
+
+        # Secondary indexes
+        self._by_owner = {}
+        self._by_frequency = {}
+        self._review_dates = []  # sorted (last_reviewed, control_id) pairs
+
+        # Reverse index: control_id -> {regulation_ids}
+        self._regulations_by_control = {}
+        self._controls_by_regulation = {}
+
+        # When each regulation's content last changed (its ingestion date)
+        self._regulation_dates = {}
+
+        # Regulations whose analysis predates an edit to one of their controls
+        self._stale_regulations = set()
+
+    # ------------------------------------------------------------------
+    # Editing controls
+    # ------------------------------------------------------------------
+    def register(self, ctrl: dict):
+        """Add or replace a control and refresh its index entries."""
+        control_id = ctrl["control_id"]
+        if control_id in self.controls:
+            self._unindex(self.controls[control_id])
+
+        self.controls[control_id] = dict(ctrl)
+        self._by_owner.setdefault(ctrl.get("owner"), set()).add(control_id)
+        self._by_frequency.setdefault(ctrl.get("frequency"), set()).add(control_id)
+        if ctrl.get("last_reviewed"):
+            bisect.insort(self._review_dates, (ctrl["last_reviewed"], control_id))
+
+    def update_control(self, control_id: str, **changes) -> set:
+        """
+        Apply an edit to a control and return the regulations mapped to it.
+        Those regulations are marked stale until they are re-assessed.
+        """
+        if control_id not in self.controls:
+            raise KeyError(f"Unknown control: {control_id}")
+
+        self.register({**self.controls[control_id], **changes})
+
+        dependents = set(self._regulations_by_control.get(control_id, {}))
+        self._stale_regulations.update(dependents)
+        logger.info(f"✏️ Control {control_id} updated; {len(dependents)} dependent regulations marked for re-assessment.")
+        return dependents
+
+    def fingerprint(self) -> str:
+        """Hash of all registered controls; changes whenever any control is edited."""
+        payload = json.dumps(sorted(self.controls.items()), sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _unindex(self, ctrl: dict):
+        control_id = ctrl["control_id"]
+        self._by_owner.get(ctrl.get("owner"), set()).discard(control_id)
+        self._by_frequency.get(ctrl.get("frequency"), set()).discard(control_id)
+        if ctrl.get("last_reviewed"):
+            pos = bisect.bisect_left(self._review_dates, (ctrl["last_reviewed"], control_id))
+            if pos < len(self._review_dates) and self._review_dates[pos] == (ctrl["last_reviewed"], control_id):
+                del self._review_dates[pos]
+
+    # ------------------------------------------------------------------
+    # Control lookups
+    # ------------------------------------------------------------------
+    def get(self, control_id: str):
+        return self.controls.get(control_id)
+
+    def owners(self) -> list:
+        """Names of all owners with at least one registered control."""
+        return sorted(owner for owner, control_ids in self._by_owner.items() if owner and control_ids)
+
+    def by_owner(self, owner: str) -> list:
+        return [self.controls[cid] for cid in sorted(self._by_owner.get(owner, ()))]
+
+    def by_frequency(self, frequency: str) -> list:
+        return [self.controls[cid] for cid in sorted(self._by_frequency.get(frequency, ()))]
+
+    def reviewed_between(self, start: str = None, end: str = None) -> list:
+        """Controls whose last_reviewed date (YYYY-MM-DD) falls within [start, end]."""
+        lo = bisect.bisect_left(self._review_dates, (start, "")) if start else 0
+        hi = bisect.bisect_right(self._review_dates, (end, "\uffff")) if end else len(self._review_dates)
+        return [self.controls[cid] for _, cid in self._review_dates[lo:hi]]
+
+    def overdue_for_review(self, max_age_days: int, as_of: datetime = None) -> list:
+        """Controls not reviewed within the last max_age_days."""
+        cutoff = (as_of or datetime.now()).toordinal() - max_age_days
+        return self.reviewed_between(end=datetime.fromordinal(cutoff).strftime("%Y-%m-%d"))
+
+    # ------------------------------------------------------------------
+    # Regulation mappings
+    # ------------------------------------------------------------------
+    def record_mapping(self, regulation_id: str, control_ids, changed_at: str = None):
+        """
+        Replace the set of controls linked to a regulation; clears its stale flag.
+        changed_at is when the regulation itself last changed; re-mapping an
+        unchanged regulation keeps its previous date.
+        """
+        for control_id in self._controls_by_regulation.pop(regulation_id, set()):
+            self._regulations_by_control.get(control_id, set()).discard(regulation_id)
+
+        linked = {cid for cid in control_ids if cid in self.controls}
+        self._controls_by_regulation[regulation_id] = linked
+        for control_id in linked:
+            self._regulations_by_control.setdefault(control_id, set()).add(regulation_id)
+
+        self._regulation_dates[regulation_id] = (
+            changed_at or self._regulation_dates.get(regulation_id) or datetime.now().isoformat(timespec="seconds")
+        )
+        self._stale_regulations.discard(regulation_id)
+
+    def regulations_for_control(self, control_id: str, since: str = None) -> list:
+        """Regulation ids mapped to a control, optionally only those that changed on or after `since`."""
+        return sorted(
+            reg for reg in self._regulations_by_control.get(control_id, ())
+            if not since or self._regulation_dates.get(reg, "") >= since
+        )
+
+    def controls_for_regulation(self, regulation_id: str) -> list:
+        return [self.controls[cid] for cid in sorted(self._controls_by_regulation.get(regulation_id, ()))]
+
+    def owner_report(self, owner: str, since: str = None) -> dict:
+        """Map each control owned by `owner` that has linked regulations (optionally since a date) to those regulations."""
+        report = {}
+        for cid in sorted(self._by_owner.get(owner, ())):
+            regulations = self.regulations_for_control(cid, since)
+            if regulations:
+                report[cid] = regulations
+        return report
+
+    def stale_regulations(self) -> set:
+        return set(self._stale_regulations)
+
+    def mark_stale(self, regulation_ids) -> set:
+        """Flag regulations for re-assessment (e.g. a control they were mapped to was deleted)."""
+        regulation_ids = set(regulation_ids)
+        self._stale_regulations.update(regulation_ids)
+        return regulation_ids
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def to_dict(self) -> dict:
+        """Serializable snapshot of controls and regulation links (stored with the workflow results)."""
+        return {
+            "controls": self.controls,
+            "regulations_by_control": {cid: sorted(regs) for cid, regs in self._regulations_by_control.items() if regs},
+            "regulation_dates": self._regulation_dates,
+            "stale_regulations": sorted(self._stale_regulations),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Rebuild a registry, including its indexes, from to_dict() output."""
+        registry = cls()
+        for ctrl in (data.get("controls") or {}).values():
+            registry.register(ctrl)
+        registry.load_links(data)
+        return registry
+
+    def load_links(self, data: dict):
+        """Restore regulation links from to_dict() output, keeping the current control records."""
+        dates = data.get("regulation_dates") or {}
+        links = {}
+        for control_id, regulation_ids in (data.get("regulations_by_control") or {}).items():
+            for regulation_id in regulation_ids:
+                links.setdefault(regulation_id, []).append(control_id)
+        for regulation_id, control_ids in links.items():
+            self.record_mapping(regulation_id, control_ids, dates.get(regulation_id))
+        self._stale_regulations.update(data.get("stale_regulations") or [])
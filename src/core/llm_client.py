@@ -3,38 +3,170 @@ LLM Client Module
 Handles interaction with OpenAI or compatible LLM endpoints.
 """
 
-from langchain_openai import ChatOpenAI
 from loguru import logger
 from dotenv import load_dotenv
 
+from core.llm_backends import BATCH_ITEM_MARKER, BATCH_ITEM_PATTERN, LLMBackend, MockBackend, create_backend
+
 
 class LLMClient:
-    def __init__(self, model_name: str, api_key: str):
+    def __init__(self, model_name: str, api_key: str, batch_token_budget: int = 0, backend=None,
+                 batch_max_items: int = 8):
         self.model_name = model_name
         self.api_key = api_key
+        # Approximate token budget (prompts plus expected answers) for one batched request (0 disables batching)
+        self.batch_token_budget = batch_token_budget
+        # Cap on items per batched request, so the combined answer stays within the model's output limit
+        self.batch_max_items = max(1, batch_max_items)
 
-        if not self.api_key:
-            logger.warning("⚠️ No OPENAI_API_KEY found. Running in mock mode.")
-        else:
+        if backend is None:
+            # Mock output is fabricated, so it must be requested explicitly rather than used as a silent fallback
+            if not self.api_key:
+                raise ValueError("No OPENAI_API_KEY found. Set LLM_BACKEND=mock to run offline with mock output.")
             logger.info("✅ OpenAI API key loaded successfully.")
+            backend = "openai"
+        elif backend == MockBackend.name or isinstance(backend, MockBackend):
+            logger.warning("⚠️ Running with the mock LLM backend — results are synthetic, not real analysis.")
 
         logger.info(f"Initializing LLM client with model: {model_name}")
-        self.client = ChatOpenAI(
-            model=model_name,
-            temperature=0.2,
-            api_key=api_key
-        )
+        if self.batching_enabled:
+            logger.info(f"📦 Batching enabled with a budget of ~{batch_token_budget} tokens per request.")
+
+        # Accept either a ready backend instance or a backend name
+        self.backend = backend if isinstance(backend, LLMBackend) else create_backend(backend, model_name, api_key)
+
+    @property
+    def backend_name(self) -> str:
+        return self.backend.name
+
+    @property
+    def batching_enabled(self) -> bool:
+        return self.batch_token_budget > 0
 
     def generate_text(self, prompt: str) -> str:
         """Generate a text completion using the LLM."""
         try:
-            response = self.client.invoke(prompt)
-            return response.content
+            return self.backend.invoke(prompt)
         except Exception as e:
             logger.error(f"LLM generation failed: {e}")
             return "Error: LLM request failed."
 
     def summarize_text(self, text: str, max_length: int = 300) -> str:
         """Summarize long regulatory text for compliance overview."""
-        prompt = f"Summarize this document for compliance officers (max {max_length} words):\n\n{text}"
+        prompt = self._summary_prompt(text, max_length)
         return self.generate_text(prompt)
+
+    def summarize_batch(self, texts: list, max_length: int = 300, validate=None) -> list:
+        """Summarize several documents, packing small ones into shared requests when batching is enabled."""
+        prompts = [self._summary_prompt(text, max_length) for text in texts]
+        # ~0.75 words per token
+        output_tokens = max_length * 4 // 3
+        return self.generate_batch(prompts, validate=validate or self.is_valid_text, output_tokens=output_tokens)
+
+    @staticmethod
+    def is_valid_text(text: str) -> bool:
+        """Reject empty answers and the placeholder returned for failed requests."""
+        return bool(text and text.strip()) and not text.startswith("Error")
+
+    def generate_batch(self, prompts: list, validate=None, output_tokens: int = 0) -> list:
+        """
+        Generate one completion per prompt, in order.
+
+        When batching is enabled, prompts are grouped up to the token budget
+        (counting `output_tokens` of expected answer per item) and sent as a
+        single structured request. Answers that split out of the batched reply
+        and pass `validate` (an optional callable) are kept; only missing or
+        invalid items are re-requested individually.
+        """
+        if not self.batching_enabled:
+            return [self.generate_text(prompt) for prompt in prompts]
+
+        results = [None] * len(prompts)
+        for group in self._plan_batches(prompts, output_tokens):
+            if len(group) == 1:
+                index = group[0]
+                results[index] = self.generate_text(prompts[index])
+                continue
+
+            answers = self._generate_group([prompts[i] for i in group], validate)
+            missing = [index for index, answer in zip(group, answers) if answer is None]
+            if missing:
+                logger.warning(f"⚠️ Batched response for {len(group)} items lacked {len(missing)} valid answers "
+                               f"— re-requesting those individually.")
+
+            for index, answer in zip(group, answers):
+                results[index] = answer if answer is not None else self.generate_text(prompts[index])
+
+        return results
+
+    # ------------------------------------------------------------------
+    # Batching helpers
+    # ------------------------------------------------------------------
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Cheap token estimate (~4 characters per token for English text)."""
+        return len(text) // 4 + 1
+
+    @staticmethod
+    def _summary_prompt(text: str, max_length: int) -> str:
+        return f"Summarize this document for compliance officers (max {max_length} words):\n\n{text}"
+
+    def _plan_batches(self, prompts: list, output_tokens: int = 0) -> list:
+        """Group prompt indices so each group stays within the token budget and the item cap."""
+        groups, current, current_tokens = [], [], 0
+        for index, prompt in enumerate(prompts):
+            tokens = self.estimate_tokens(prompt) + output_tokens
+            if current and (current_tokens + tokens > self.batch_token_budget or len(current) >= self.batch_max_items):
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    def _generate_group(self, prompts: list, validate=None) -> list:
+        """Send several prompts as one request; return per-item answers, None where missing or invalid."""
+        sections = "\n\n".join(
+            f"{BATCH_ITEM_MARKER.format(index=i + 1)}\n{prompt}" for i, prompt in enumerate(prompts)
+        )
+        batch_prompt = f"""
+You will receive {len(prompts)} independent tasks, each introduced by a marker line like {BATCH_ITEM_MARKER.format(index=1)}.
+Complete every task separately. Start each answer with the same marker line as its task,
+answer the tasks in order, and do not add any text outside the marked answers.
+
+{sections}
+"""
+        response = self.generate_text(batch_prompt)
+        return [
+            answer if answer is not None and (validate is None or validate(answer)) else None
+            for answer in self._split_batch_response(response, len(prompts))
+        ]
+
+    @staticmethod
+    def _split_batch_response(response: str, expected: int) -> list:
+        """
+        Split a batched reply on its item markers into `expected` answers.
+        Missing, empty, repeated or out-of-range items come back as None. A reply
+        that stops before the last item was probably cut off, so the final answer
+        it does contain is treated as missing too.
+        """
+        answers = [None] * expected
+        if not response or response.startswith("Error"):
+            return answers
+
+        parts = BATCH_ITEM_PATTERN.split(response)
+        # parts = [preamble, "1", answer1, "2", answer2, ...]
+        found = {}
+        for index, answer in zip(parts[1::2], parts[2::2]):
+            found.setdefault(int(index), []).append(answer.strip())
+        for index, candidates in found.items():
+            if 1 <= index <= expected and len(candidates) == 1 and candidates[0]:
+                answers[index - 1] = candidates[0]
+
+        markers = parts[1::2]
+        if markers and answers[-1] is None:
+            last = int(markers[-1])
+            if 1 <= last <= expected:
+                answers[last - 1] = None
+        return answers
@@ -53,19 +53,54 @@ class Retriever:
                     self.add_document(doc_id, content, {"type": doc_type})
         logger.info(f"Loaded {len(self.documents)} {doc_type} documents.")
 
-    def load_controls_from_directory(self, directory):
-        """Load JSON files containing internal control data."""
+    def load_controls_from_directory(self, directory, registry=None):
+        """Load JSON files containing internal control data (and index them in a ControlRegistry if given)."""
         import os
         from loguru import logger
 
         logger.info(f"Loading internal controls from {directory}...")
+        loaded = set()
         for file in os.listdir(directory):
             if file.endswith(".json"):
                 with open(os.path.join(directory, file), "r", encoding="utf-8") as f:
                     controls = json.load(f)
                     for ctrl in controls:
-                        doc_id = f"control_{ctrl['control_id']}"
-                        text = f"{ctrl['name']}: {ctrl['description']}"
-                        self.add_document(doc_id, text, {"type": "control", "owner": ctrl["owner"]})
+                        # Upsert so stores built before control_id metadata existed get refreshed
+                        self.upsert_control(ctrl)
+                        loaded.add(ctrl["control_id"])
+                        if registry is not None:
+                            registry.register(ctrl)
+
+        # Controls deleted from disk must stop being retrieved
+        loaded_ids = {self._control_id(control_id) for control_id in loaded}
+        stored = self.collection.get(where={"type": "control"})
+        removed = [doc_id for doc_id in stored["ids"] if doc_id not in loaded_ids]
+        if removed:
+            self.collection.delete(ids=removed)
+            logger.info(f"🗑️ Removed {len(removed)} deleted controls from the vector DB.")
         logger.info(f"Loaded {len(self.documents)} total documents after adding controls.")
 
+    def upsert_control(self, ctrl: dict):
+        """Embed a control, replacing any existing entry so edits and new metadata take effect."""
+        doc_id, text, metadata = self._control_document(ctrl)
+        embedding = self.model.encode([text])[0].tolist()
+        self.collection.upsert(ids=[doc_id], embeddings=[embedding], documents=[text], metadatas=[metadata])
+        logger.debug(f"Control updated in vector DB: {doc_id}")
+
+    def delete_controls(self, control_ids):
+        """Remove controls from the vector DB so mapping no longer retrieves them."""
+        doc_ids = [self._control_id(control_id) for control_id in control_ids]
+        if doc_ids:
+            self.collection.delete(ids=doc_ids)
+            logger.debug(f"Controls removed from vector DB: {', '.join(doc_ids)}")
+
+    @staticmethod
+    def _control_id(control_id: str) -> str:
+        return f"control_{control_id}"
+
+    @classmethod
+    def _control_document(cls, ctrl: dict):
+        doc_id = cls._control_id(ctrl["control_id"])
+        text = f"{ctrl['name']}: {ctrl['description']}"
+        return doc_id, text, {"type": "control", "owner": ctrl["owner"], "control_id": ctrl["control_id"]}
+
@@ -0,0 +1,227 @@
+"""
+Structured Output Schemas
+Pydantic models for the JSON returned by ImpactAgent and ActionAgent,
+plus helpers to parse, render and index them.
+"""
+
+import re
+from typing import List, Literal
+
+from loguru import logger
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+
+class ComplianceGap(BaseModel):
+    description: str
+    control_ids: List[str] = Field(default_factory=list)
+
+    @field_validator("control_ids")
+    @classmethod
+    def keep_known_controls(cls, value, info):
+        """With a "control_ids" validation context, drop ids that weren't among the retrieved controls."""
+        known = (info.context or {}).get("control_ids")
+        if known is None:
+            return value
+        unknown = [cid for cid in value if cid not in known]
+        if unknown:
+            logger.warning(f"⚠️ Dropping control ids not retrieved for this regulation: {', '.join(unknown)}")
+        return [cid for cid in value if cid in known]
+
+
+class ImpactAssessment(BaseModel):
+    impact_summary: str
+    gaps: List[ComplianceGap] = Field(default_factory=list)
+    focus_areas: List[str] = Field(default_factory=list)
+
+
+# Common ways models phrase priority, mapped onto the three supported levels
+PRIORITY_ALIASES = {
+    "High": ("critical", "urgent", "immediate", "high", "p0", "p1"),
+    "Medium": ("medium", "moderate", "med", "normal", "p2"),
+    "Low": ("low", "minor", "p3", "p4"),
+}
+
+
+# Words that don't tell one owning team from another
+OWNER_FILLER_WORDS = {"the", "team", "dept", "department", "function", "unit", "group", "and"}
+
+
+def _owner_words(name: str) -> list:
+    return [word for word in re.findall(r"[a-z0-9]+", name.lower()) if word not in OWNER_FILLER_WORDS]
+
+
+def _abbreviates(word: str, owner_word: str) -> bool:
+    """True for the same word, a prefix of it, or an abbreviation keeping its letters in order ("ops")."""
+    if owner_word.startswith(word) or word.startswith(owner_word):
+        return True
+    letters = iter(owner_word)
+    return word[0] == owner_word[0] and all(ch in letters for ch in word)
+
+
+def match_owner(value: str, known_owners):
+    """
+    Map a free-text owner ("AML Ops team") onto one of the known owners
+    ("AML Operations"); None if no known owner matches unambiguously.
+    """
+    words = _owner_words(value)
+    if not words:
+        return None
+
+    candidates = []
+    for owner in known_owners:
+        owner_words = _owner_words(owner)
+        if owner_words == words:
+            return owner
+        if owner_words and all(any(_abbreviates(w, o) for o in owner_words) for w in words):
+            candidates.append(owner)
+    return candidates[0] if len(candidates) == 1 else None
+
+
+class ActionItem(BaseModel):
+    action: str
+    priority: Literal["High", "Medium", "Low"]
+    owner: str
+    deadline: str
+    rationale: str
+
+    @field_validator("priority", mode="before")
+    @classmethod
+    def normalise_priority(cls, value):
+        if not isinstance(value, str):
+            return value
+        words = re.findall(r"[a-z0-9]+", value.lower())
+        for level, aliases in PRIORITY_ALIASES.items():
+            if any(word in aliases for word in words):
+                return level
+        return value
+
+    @field_validator("owner")
+    @classmethod
+    def normalise_owner(cls, value, info):
+        """With an "owners" validation context, map the owner onto a known control owner."""
+        known = (info.context or {}).get("owners")
+        if not known:
+            return value
+        owner = match_owner(value, known)
+        if owner is None:
+            raise ValueError(f"Unknown owner: {value}")
+        return owner
+
+
+class ActionPlan(BaseModel):
+    # An empty plan is not a usable answer; reject it so the request is retried
+    actions: List[ActionItem] = Field(min_length=1)
+
+    @field_validator("actions", mode="before")
+    @classmethod
+    def drop_invalid_items(cls, value, info):
+        """Keep the valid action items; reject the plan only if none are usable."""
+        if not isinstance(value, list):
+            return value
+
+        items = []
+        for raw in value:
+            try:
+                items.append(ActionItem.model_validate(raw, context=info.context))
+            except ValidationError as e:
+                logger.warning(f"⚠️ Dropping invalid action item: {e.errors()[0]['msg']}")
+        if value and not items:
+            raise ValueError("No valid action items in plan")
+        return items
+
+
+# JSON shapes shown to the LLM in prompts
+IMPACT_SCHEMA_HINT = """{
+  "impact_summary": "string",
+  "gaps": [{"description": "string", "control_ids": ["C001"]}],
+  "focus_areas": ["string"]
+}"""
+
+ACTION_SCHEMA_HINT = """{
+  "actions": [
+    {
+      "action": "string",
+      "priority": "High | Medium | Low",
+      "owner": "string",
+      "deadline": "string",
+      "rationale": "string"
+    }
+  ]
+}"""
+
+
+# Prompt line listing the owners actions may be assigned to
+KNOWN_OWNERS_PREFIX = "Known owners: "
+KNOWN_OWNERS_SEPARATOR = " | "
+
+
+def known_owners_line(owners) -> str:
+    return KNOWN_OWNERS_PREFIX + KNOWN_OWNERS_SEPARATOR.join(owners)
+
+
+def parse_structured_output(text: str, model, context: dict = None):
+    """
+    Extract the JSON object from an LLM reply and validate it against a schema model.
+    context carries known values for normalisation ("owners", "control_ids").
+    """
+    if not text:
+        raise ValueError("Empty LLM response")
+
+    # Tolerate prose or ```json fences around the object
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError("No JSON object found in LLM response")
+
+    return model.model_validate_json(text[start:end + 1], context=context)
+
+
+def is_valid_output(text: str, model, context: dict = None) -> bool:
+    try:
+        parse_structured_output(text, model, context)
+        return True
+    except ValueError:
+        return False
+
+
+def render_impact(assessment: ImpactAssessment) -> str:
+    """Plain-text view of an impact assessment, in the original three-section layout."""
+    gaps = [
+        f"- {gap.description}" + (f" (Controls: {', '.join(gap.control_ids)})" if gap.control_ids else "")
+        for gap in assessment.gaps
+    ]
+    return "\n".join([
+        "1. Impact Summary",
+        assessment.impact_summary,
+        "",
+        "2. Identified Gaps",
+        *(gaps or ["- None identified."]),
+        "",
+        "3. Recommended Focus Areas",
+        *[f"- {area}" for area in assessment.focus_areas],
+    ])
+
+
+def render_action_plan(plan: ActionPlan) -> str:
+    """Plain-text view of an action plan."""
+    return "\n\n".join(
+        f"{i}. {item.action}\n"
+        f"- Priority: {item.priority}\n"
+        f"- Owner: {item.owner}\n"
+        f"- Deadline: {item.deadline}\n"
+        f"- Rationale: {item.rationale}"
+        for i, item in enumerate(plan.actions, start=1)
+    )
+
+
+def build_action_index(action_plans: list) -> dict:
+    """
+    Index structured action items by priority and owner.
+    Each entry is a [plan position, item position] reference into action_plans.
+    """
+    index = {"by_priority": {}, "by_owner": {}}
+    for plan_pos, plan in enumerate(action_plans):
+        for item_pos, item in enumerate(plan.get("action_items") or []):
+            ref = [plan_pos, item_pos]
+            index["by_priority"].setdefault(item["priority"], []).append(ref)
+            index["by_owner"].setdefault(item["owner"], []).append(ref)
+    return index
@@ -7,6 +7,9 @@ Description:
 """
 
 import os
+import json
+import argparse
+from datetime import date
 from dotenv import load_dotenv
 import yaml
 from loguru import logger
@@ -14,6 +17,7 @@ from loguru import logger
 # Import internal modules
 from core.llm_client import LLMClient
 from core.retriever import Retriever
+from core.control_registry import ControlRegistry
 from orchestration.workflow import Workflow
 from utils.logger import init_logger
 from agents.ingestion_agent import IngestionAgent
@@ -37,7 +41,10 @@ def initialize_system(config):
     # Initialize core LLM client
     llm_client = LLMClient(
         model_name=os.getenv("MODEL_NAME", "gpt-4o"),
-        api_key=os.getenv("OPENAI_API_KEY")
+        api_key=os.getenv("OPENAI_API_KEY"),
+        batch_token_budget=int(os.getenv("LLM_BATCH_TOKEN_BUDGET", config["models"].get("batch_token_budget", 0))),
+        batch_max_items=int(config["models"].get("batch_max_items", 8)),
+        backend=os.getenv("LLM_BACKEND") or config["models"].get("llm_backend")
     )
 
     # Initialize Retriever (RAG pipeline)
@@ -48,7 +55,8 @@ def initialize_system(config):
 
     retriever.load_from_directory("./src/data/policies", "policy")
     retriever.load_from_directory("./src/data/regulatory_updates", "regulation")
-    retriever.load_controls_from_directory("./src/data/controls")
+    control_registry = ControlRegistry()
+    retriever.load_controls_from_directory("./src/data/controls", registry=control_registry)
 
     # Read from .env (default: false)
     force_refresh = os.getenv("FORCE_REFRESH", "false").lower() == "true"
@@ -65,20 +73,61 @@ def initialize_system(config):
     workflow = Workflow(
         llm_client=llm_client,
         retriever=retriever,
-    ingestion_agent=ingestion_agent
+    ingestion_agent=ingestion_agent,
+        pipeline_config=config.get("pipeline"),
+        control_registry=control_registry
     )
 
     return workflow
 
 
+def print_owner_report(owner, since=None):
+    """Print controls owned by `owner` and the regulations mapped to them, from the last saved results."""
+    if not os.path.exists(Workflow.OUTPUT_PATH):
+        logger.error("No analysis results found. Run the workflow first.")
+        return
+
+    with open(Workflow.OUTPUT_PATH, "r", encoding="utf-8") as f:
+        results = json.load(f)
+
+    registry = ControlRegistry.from_dict(results.get("control_index") or {})
+    titles = {doc.get("id"): doc.get("title") for doc in results.get("regulatory_updates", [])}
+    report = {
+        control_id: [titles.get(reg, reg) for reg in regulation_ids]
+        for control_id, regulation_ids in registry.owner_report(owner, since).items()
+    }
+    print(json.dumps(report, indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Regulatory Compliance Copilot")
+    parser.add_argument("--owner-report", metavar="OWNER",
+                        help="List controls owned by OWNER and the regulations mapped to them, then exit")
+    parser.add_argument("--since", metavar="YYYY-MM-DD", type=date.fromisoformat,
+                        help="With --owner-report: only regulations that changed on or after this date")
+    parser.add_argument("--reassess-changed-controls", action="store_true",
+                        help="Re-assess only regulations mapped to controls edited since the last run")
+    return parser.parse_args()
+
+
 def main():
     """Main execution flow."""
+    args = parse_args()
     init_logger()
+
+    if args.owner_report:
+        print_owner_report(args.owner_report, args.since.isoformat() if args.since else None)
+        return
+
     config = load_config()
     workflow = initialize_system(config)
 
     logger.info("System initialized successfully ✅")
 
+    if args.reassess_changed_controls:
+        workflow.reassess_changed_controls()
+        return
+
     # Run the workflow
     workflow.run()
 
@@ -0,0 +1,321 @@
+"""
+Stage Scheduler Module
+Runs each regulation through a dependency graph of stages independently,
+using bounded queues, per-stage worker pools, retries and checkpointing.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+from loguru import logger
+
+
+_STOP = object()
+
+
+class RetryPolicy:
+    """How often a failing stage is retried, with exponential backoff between attempts."""
+
+    def __init__(self, max_attempts: int = 3, backoff_seconds: float = 0.5, backoff_factor: float = 2.0):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.backoff_factor = backoff_factor
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the given (1-based) failed attempt."""
+        return self.backoff_seconds * (self.backoff_factor ** (attempt - 1))
+
+
+class Stage:
+    """
+    One node of the pipeline graph.
+
+    Root stages (no dependencies) receive the source item; stages with one
+    dependency receive that stage's result; stages with several receive a
+    dict of {dependency name: result}. With batch_size > 1 the function is
+    called with a list of inputs and must return a list of results in order;
+    an Exception in that list fails (and retries) only the matching item.
+    batch_wait_seconds is how long a worker waits for a batch to fill before
+    sending what it has.
+    """
+
+    def __init__(self, name, func, depends_on=(), workers: int = 1, queue_size: int = 32,
+                 retry: RetryPolicy = None, batch_size: int = 1, batch_wait_seconds: float = 0.0):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.retry = retry or RetryPolicy()
+        self.batch_size = max(1, batch_size)
+        self.batch_wait_seconds = max(0.0, batch_wait_seconds)
+
+
+class CheckpointStore:
+    """
+    Append-only JSON-lines log of completed (item, stage) results, so an
+    interrupted run can resume from the last completed stage of each item.
+    Callers clear it once the run's results have been saved.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._completed = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write can leave a truncated last line
+                    continue
+                self._completed.setdefault(record["key"], {})[record["stage"]] = record["result"]
+        logger.info(f"💾 Loaded checkpoints for {len(self._completed)} items from {self.path}")
+
+    def get(self, key) -> dict:
+        """Completed stage results for one item."""
+        return self._completed.get(key, {})
+
+    def save(self, key, stage: str, result):
+        with self._lock:
+            self._completed.setdefault(key, {})[stage] = result
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "stage": stage, "result": result}) + "\n")
+
+    def clear(self):
+        with self._lock:
+            self._completed = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class StageScheduler:
+    """Streams items through a DAG of stages; each item advances as soon as its own dependencies finish."""
+
+    def __init__(self, stages, checkpoint: CheckpointStore = None):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique.")
+
+        self.downstream = {name: [] for name in self.stages}
+        for stage in stages:
+            for dep in stage.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'.")
+                self.downstream[dep].append(stage.name)
+
+        self.order = self._topological_order()
+        self.checkpoint = checkpoint
+
+    def _topological_order(self):
+        remaining = {name: set(stage.depends_on) for name, stage in self.stages.items()}
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Stage graph has a cycle among: {', '.join(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def run(self, items, key=lambda item: item["id"], on_result=None, checkpoint_key=None):
+        """
+        Process all items and return (results, failures).
+
+        results maps stage name -> {item key: result}; failures maps item key ->
+        {"stage": ..., "error": ...}. on_result(stage, key, result) is called as
+        soon as each stage completes for an item (and for results restored from
+        the checkpoint), for streaming consumers.
+        checkpoint_key(item) names the item in the checkpoint (defaults to key),
+        so callers can include content hashes and only resume identical work.
+        """
+        self._sources = {}
+        self._checkpoint_keys = {}
+        self._results = {name: {} for name in self.stages}
+        self._scheduled = {}
+        self._failures = {}
+        self._on_result = on_result
+        self._lock = threading.Lock()
+        self._queues = {name: queue.Queue(maxsize=stage.queue_size) for name, stage in self.stages.items()}
+
+        threads = []
+        for name, stage in self.stages.items():
+            for i in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(stage,), name=f"{name}-{i}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        # Feeding blocks whenever a root queue is full (backpressure)
+        for item in items:
+            item_key = key(item)
+            self._sources[item_key] = item
+            self._checkpoint_keys[item_key] = checkpoint_key(item) if checkpoint_key else item_key
+            self._scheduled[item_key] = set()
+            self._restore(item_key)
+            for name in self._ready_stages(item_key, self.order):
+                self._queues[name].put((item_key, self._inputs(name, item_key)))
+
+        # Upstream queues drain first, so once a queue joins nothing else will be added to it
+        for name in self.order:
+            self._queues[name].join()
+        for name, stage in self.stages.items():
+            for _ in range(stage.workers):
+                self._queues[name].put(_STOP)
+        for thread in threads:
+            thread.join()
+
+        return self._results, self._failures
+
+    # ------------------------------------------------------------------
+    # Internal helpers
+    # ------------------------------------------------------------------
+    def _restore(self, item_key):
+        """Reuse checkpointed results whose dependencies were also completed."""
+        if not self.checkpoint:
+            return
+        completed = self.checkpoint.get(self._checkpoint_keys[item_key])
+        for name in self.order:
+            deps_done = all(dep in self._scheduled[item_key] for dep in self.stages[name].depends_on)
+            if name in completed and deps_done:
+                self._results[name][item_key] = completed[name]
+                self._scheduled[item_key].add(name)
+        if not self._scheduled[item_key]:
+            return
+        logger.info(f"♻️ Resuming {item_key} after stages: {', '.join(sorted(self._scheduled[item_key]))}")
+
+        if self._on_result:
+            for name in self.order:
+                if name not in self._scheduled[item_key]:
+                    continue
+                try:
+                    self._on_result(name, item_key, self._results[name][item_key])
+                except Exception as e:
+                    logger.error(f"❌ Stage '{name}' could not report restored result for {item_key}: {e}")
+                    self._fail(self.stages[name], [item_key], e)
+                    return
+
+    def _ready_stages(self, item_key, candidates):
+        """Mark and return candidate stages whose dependencies are all complete for this item."""
+        ready = []
+        with self._lock:
+            if item_key in self._failures:
+                return ready
+            for name in candidates:
+                if name in self._scheduled[item_key]:
+                    continue
+                if all(item_key in self._results[dep] for dep in self.stages[name].depends_on):
+                    self._scheduled[item_key].add(name)
+                    ready.append(name)
+        return ready
+
+    def _inputs(self, name, item_key):
+        deps = self.stages[name].depends_on
+        if not deps:
+            return self._sources[item_key]
+        if len(deps) == 1:
+            return self._results[deps[0]][item_key]
+        return {dep: self._results[dep][item_key] for dep in deps}
+
+    def _worker(self, stage):
+        work_queue = self._queues[stage.name]
+        while True:
+            entry = work_queue.get()
+            if entry is _STOP:
+                work_queue.task_done()
+                return
+
+            # Batched stages wait up to batch_wait_seconds for more items, since upstream results arrive one by one
+            batch = [entry]
+            stop = False
+            deadline = time.monotonic() + stage.batch_wait_seconds
+            while len(batch) < stage.batch_size:
+                try:
+                    extra = work_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if extra is _STOP:
+                    work_queue.task_done()
+                    stop = True
+                    break
+                batch.append(extra)
+
+            try:
+                self._process(stage, batch)
+            except Exception as e:
+                # Never let an item silently drop out: anything unfinished is recorded as failed
+                logger.error(f"❌ Stage '{stage.name}' worker error: {e}")
+                self._fail(stage, [item_key for item_key, _ in batch if item_key not in self._results[stage.name]], e)
+            finally:
+                for _ in batch:
+                    work_queue.task_done()
+
+            if stop:
+                return
+
+    def _process(self, stage, batch):
+        pending = list(batch)
+
+        for attempt in range(1, stage.retry.max_attempts + 1):
+            try:
+                if stage.batch_size > 1:
+                    outputs = stage.func([stage_input for _, stage_input in pending])
+                    if len(outputs) != len(pending):
+                        raise ValueError(f"expected {len(pending)} results, got {len(outputs)}")
+                else:
+                    outputs = [stage.func(pending[0][1])]
+            except Exception as e:
+                outputs = [e] * len(pending)
+
+            # Complete successful items now; only failed ones go round again
+            retry = []
+            for (item_key, stage_input), output in zip(pending, outputs):
+                if isinstance(output, Exception):
+                    retry.append((item_key, stage_input, output))
+                else:
+                    self._complete(stage, item_key, output)
+
+            if not retry:
+                return
+            if attempt == stage.retry.max_attempts:
+                for item_key, _, error in retry:
+                    logger.error(f"❌ Stage '{stage.name}' failed for {item_key} after {attempt} attempts: {error}")
+                    self._fail(stage, [item_key], error)
+                return
+
+            logger.warning(f"⚠️ Stage '{stage.name}' attempt {attempt} failed for {len(retry)} items "
+                           f"({retry[0][2]}) — retrying.")
+            time.sleep(stage.retry.delay(attempt))
+            pending = [(item_key, stage_input) for item_key, stage_input, _ in retry]
+
+    def _complete(self, stage, item_key, output):
+        """Store a result, checkpoint it and hand the item to any stages that are now ready."""
+        try:
+            with self._lock:
+                self._results[stage.name][item_key] = output
+            if self.checkpoint:
+                self.checkpoint.save(self._checkpoint_keys[item_key], stage.name, output)
+            if self._on_result:
+                self._on_result(stage.name, item_key, output)
+
+            for name in self._ready_stages(item_key, self.downstream[stage.name]):
+                self._queues[name].put((item_key, self._inputs(name, item_key)))
+        except Exception as e:
+            logger.error(f"❌ Stage '{stage.name}' could not hand off {item_key}: {e}")
+            self._fail(stage, [item_key], e)
+
+    def _fail(self, stage, keys, error):
+        with self._lock:
+            for item_key in keys:
+                self._failures[item_key] = {"stage": stage.name, "error": str(error)}
@@ -1,10 +1,17 @@
+import hashlib
 import json
+import os
+import threading
+import time
 from loguru import logger
 
 from agents.ingestion_agent import IngestionAgent
 from agents.mapping_agent import MappingAgent
 from agents.impact_agent import ImpactAgent
 from agents.action_agent import ActionAgent
+from core.control_registry import ControlRegistry
+from core.schemas import build_action_index
+from orchestration.scheduler import CheckpointStore, RetryPolicy, Stage, StageScheduler
 
 
 class Workflow:
@@ -14,25 +21,47 @@ class Workflow:
     2️⃣ Map to internal policies and controls
     3️⃣ Assess compliance impact
     4️⃣ Recommend actions
+
+    Steps 1-4 run per regulation through a StageScheduler, so each regulation
+    moves to the next step as soon as its own previous step is done.
     """
 
-    def __init__(self, llm_client, retriever, ingestion_agent=None):
+    DEFAULT_CHECKPOINT_PATH = "./src/data/output/workflow_checkpoint.jsonl"
+
+    OUTPUT_PATH = "./src/data/output/compliance_analysis.json"
+
+    # Minimum seconds between saves of partial results while a run is in progress
+    DEFAULT_SAVE_INTERVAL_SECONDS = 2.0
+
+    # Stage name -> section of the saved results holding its per-regulation output
+    STAGE_SECTIONS = {"map": "mappings", "impact": "impacts", "action": "actions"}
+
+    def __init__(self, llm_client, retriever, ingestion_agent=None, pipeline_config=None, control_registry=None):
         self.llm_client = llm_client
         self.retriever = retriever
         self.ingestion_agent = ingestion_agent or IngestionAgent(llm_client, retriever, mode="mock")
+        self.pipeline_config = pipeline_config or {}
+        self.control_registry = control_registry or ControlRegistry()
+
+        # State of the last run, kept so control edits can re-assess only affected regulations
+        self.documents = {}
+        self.stage_results = {}
+        self.failures = {}
+        self._results_lock = threading.RLock()
+        self._last_save = 0.0
 
         # Initialize downstream agents
         self.mapping_agent = MappingAgent(llm_client, retriever)
         self.impact_agent = ImpactAgent(llm_client)
-        self.action_agent = ActionAgent(llm_client)
+        self.action_agent = ActionAgent(llm_client, self.control_registry)
 
     def run(self):
         """Run the complete regulatory compliance analysis workflow."""
         logger.info("🚀 Starting Regulatory Compliance Copilot workflow...")
 
-        # --- 1️⃣ Ingest new regulations ---
-        logger.info("Step 1: Ingesting latest regulatory updates...")
-        new_docs = self.ingestion_agent.fetch_latest_updates()
+        # --- 1️⃣ Fetch new regulations (summarized per document in the ingest stage) ---
+        logger.info("Step 1: Fetching latest regulatory updates...")
+        new_docs = self.ingestion_agent.fetch_documents()
         print("DEBUG DOCS:", new_docs)
 
         if not new_docs:
@@ -42,44 +71,279 @@ class Workflow:
         logger.info(f"Fetched {len(new_docs)} new regulatory updates.")
         logger.debug(json.dumps(new_docs, indent=2))
 
-        # --- 2️⃣ Map to internal policies & controls ---
-        logger.info("Step 2: Mapping regulations to internal policies and controls...")
-        mappings = self.mapping_agent.map_to_policies_and_controls(new_docs)
-        logger.info(f"Generated {len(mappings)} mappings.")
-        logger.debug(json.dumps(mappings, indent=2))
-
-        # --- 3️⃣ Assess impact ---
-        logger.info("Step 3: Assessing impact for each regulatory update...")
-        impact_summaries = []
-        for mapping in mappings:
-            impact = self.impact_agent.evaluate_impact(mapping)
-            impact_summaries.append(impact)
-
-        logger.info(f"Completed impact analysis for {len(impact_summaries)} regulations.")
-        logger.debug(json.dumps(impact_summaries, indent=2))
-
-        # --- 4️⃣ Recommend compliance actions ---
-        logger.info("Step 4: Generating recommended actions...")
-        actions = []
-        for impact in impact_summaries:
-            action_plan = self.action_agent.generate_recommendations(impact)
-            actions.append(action_plan)
-
-        logger.info(f"Generated {len(actions)} action plans.")
+        # --- 1️⃣-4️⃣ Summarize, map, assess impact and recommend actions per regulation ---
+        logger.info("Steps 1-4: Streaming regulations through ingest → mapping → impact → action stages...")
+        checkpoint = CheckpointStore(self.pipeline_config.get("checkpoint_path", self.DEFAULT_CHECKPOINT_PATH))
+        if self.ingestion_agent.force_refresh:
+            # A forced refresh re-summarizes everything, so earlier partial runs can't be reused
+            checkpoint.clear()
+        # Raw documents are replaced by their summaries as the ingest stage completes
+        self.documents = {self._regulation_key(doc): doc for doc in new_docs}
+        self.stage_results = {name: {} for name in self.STAGE_SECTIONS}
+        self.failures = {}
+        _, self.failures = self._run_stages(new_docs, checkpoint)
+
+        if self.failures:
+            logger.warning(f"⚠️ {len(self.failures)} regulations did not complete; checkpoint kept for resume.")
+        else:
+            checkpoint.clear()
+
+        results = self._save_results()
+        logger.success(f"🎯 Workflow completed successfully! Results saved to: {self.OUTPUT_PATH}")
+
+        return results
+
+    def update_control(self, control_id, **changes):
+        """Apply an edit to an internal control and re-assess only the regulations mapped to it."""
+        dependents = self.control_registry.update_control(control_id, **changes)
+        self.retriever.upsert_control(self.control_registry.get(control_id))
+        return self.reassess(dependents)
+
+    def reassess_changed_controls(self):
+        """
+        Compare the controls loaded now with those saved in the last results and
+        re-assess only the regulations mapped to controls that changed or were deleted.
+        """
+        previous = self.load_results()
+        if previous is None:
+            logger.warning("No previous results found — run the full workflow first.")
+            return None
+
+        saved_index = previous.get("control_index") or {}
+        saved_controls = saved_index.get("controls") or {}
+        current = self.control_registry.controls
+        changed = [
+            control_id for control_id, ctrl in current.items()
+            if control_id in saved_controls and saved_controls[control_id] != ctrl
+        ]
+        added = sorted(set(current) - set(saved_controls))
+        removed = sorted(set(saved_controls) - set(current))
+        logger.info(f"🔎 {len(changed)} controls changed since the last run: {', '.join(changed) or 'none'}")
+        logger.info(f"🔎 {len(removed)} controls deleted since the last run: {', '.join(removed) or 'none'}")
+        if added:
+            logger.info(f"➕ {len(added)} controls added since the last run: {', '.join(added)} "
+                        f"— run the full workflow to map existing regulations onto them.")
+
+        dependents = set()
+        for control_id in changed:
+            dependents |= self.control_registry.update_control(control_id)
+
+        # Deleted controls are no longer in the registry, so their links come from the saved results
+        saved_links = saved_index.get("regulations_by_control") or {}
+        for control_id in removed:
+            dependents |= self.control_registry.mark_stale(saved_links.get(control_id, []))
+        self.retriever.delete_controls(removed)
+
+        results = self.reassess(dependents)
+        if results is None and (changed or added or removed):
+            # Nothing to re-run, but keep the saved control snapshot in step with the controls on disk
+            results = self._save_results()
+        return results
+
+    def load_results(self):
+        """Restore the last saved run (results and control links) so it can be partially re-assessed."""
+        if not os.path.exists(self.OUTPUT_PATH):
+            return None
+        with open(self.OUTPUT_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.documents = {self._regulation_key(doc): doc for doc in data.get("regulatory_updates", [])}
+        self.stage_results = {
+            name: {entry["regulation_id"]: entry for entry in data.get(section, []) if "regulation_id" in entry}
+            for name, section in self.STAGE_SECTIONS.items()
+        }
+        self.failures = data.get("failures", {})
+        self.control_registry.load_links(data.get("control_index") or {})
+        return data
+
+    def reassess(self, regulation_ids):
+        """Re-run mapping, impact and action for the given regulations from the last run."""
+        docs = [self.documents[key] for key in regulation_ids if key in self.documents]
+        if not docs:
+            logger.info("No dependent regulations from the last run to re-assess.")
+            return None
+
+        logger.info(f"♻️ Re-assessing {len(docs)} regulations affected by control changes...")
+        for doc in docs:
+            key = self._regulation_key(doc)
+            self.failures.pop(key, None)
+            for by_key in self.stage_results.values():
+                by_key.pop(key, None)
+
+        # Documents from the last run are already summarized, so start at mapping
+        _, failures = self._run_stages(docs, ingest=False)
+        self.failures.update(failures)
+
+        return self._save_results()
+
+    def _run_stages(self, docs, checkpoint=None, ingest=True):
+        """Stream documents through the stage graph; results are collected as each stage finishes."""
+        scheduler = StageScheduler(self._build_stages(ingest), checkpoint=checkpoint)
+        return scheduler.run(
+            docs,
+            key=self._regulation_key,
+            on_result=self._record_result,
+            checkpoint_key=self._checkpoint_key
+        )
+
+    def _record_result(self, stage, key, result):
+        """Keep a finished stage result and periodically save regulations whose action plans are done."""
+        logger.info(f"✔️ {stage} completed for {key}")
+        with self._results_lock:
+            if stage == "ingest":
+                self.documents[key] = result
+                return
+            self.stage_results.setdefault(stage, {})[key] = result
+            if stage == "map":
+                self._record_mapping(key, result)
+
+            # Action plans are the last stage; saving them early lets the dashboard show partial results
+            interval = self.pipeline_config.get("save_interval_seconds", self.DEFAULT_SAVE_INTERVAL_SECONDS)
+            if stage == "action" and time.monotonic() - self._last_save >= interval:
+                self._save_results()
+
+    def _record_mapping(self, key, mapping):
+        """Index which controls a regulation was mapped to."""
+        control_ids = [
+            item["metadata"]["control_id"]
+            for item in mapping.get("related_policies_controls", [])
+            if (item.get("metadata") or {}).get("control_id")
+        ]
+        self.control_registry.record_mapping(key, control_ids, self.documents.get(key, {}).get("ingested_at"))
+
+    def _save_results(self):
+        """Write the current results to disk (called periodically during a run and once at the end)."""
+        with self._results_lock:
+            results = self._assemble_results()
+
+            # Write then rename, so readers never see a half-written file
+            tmp_path = f"{self.OUTPUT_PATH}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            os.replace(tmp_path, self.OUTPUT_PATH)
+            self._last_save = time.monotonic()
+
+        return results
+
+    def _assemble_results(self):
+        """Assemble per-regulation stage results in ingestion order."""
+        keys = list(self.documents)
+        sections = {
+            section: [
+                {**self.stage_results[name][k], "regulation_id": k}
+                for k in keys if k in self.stage_results.get(name, {})
+            ]
+            for name, section in self.STAGE_SECTIONS.items()
+        }
+        mappings, impact_summaries, actions = sections["mappings"], sections["impacts"], sections["actions"]
+
+        logger.info(f"Generated {len(mappings)} mappings, {len(impact_summaries)} impact analyses "
+                    f"and {len(actions)} action plans.")
         logger.debug(json.dumps(actions, indent=2))
 
         # --- ✅ Final Output ---
         results = {
-            "regulatory_updates": new_docs,
+            # Which LLM backend produced this analysis ("mock" output is synthetic)
+            "llm_backend": self.llm_client.backend_name,
+            "regulatory_updates": list(self.documents.values()),
             "mappings": mappings,
             "impacts": impact_summaries,
-            "actions": actions
+            "actions": actions,
+            # Priority / owner lookups into actions[i]["action_items"][j]
+            "action_index": build_action_index(actions),
+            # Controls plus control -> regulation links, for owner-scoped lookups and targeted re-assessment
+            "control_index": self.control_registry.to_dict(),
+            "failures": self.failures
         }
+        return results
 
-        output_path = "./src/data/output/compliance_analysis.json"
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2)
+    # ------------------------------------------------------------------
+    # Pipeline definition
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _regulation_key(doc):
+        return doc.get("id") or doc.get("title", "Untitled Regulation")
 
-        logger.success(f"🎯 Workflow completed successfully! Results saved to: {output_path}")
+    def _checkpoint_key(self, doc):
+        """Resume only identical work: same regulation content, same controls."""
+        payload = json.dumps({
+            "controls": self.control_registry.fingerprint(),
+            "document": doc
+        }, sort_keys=True)
+        return f"{self._regulation_key(doc)}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]}"
 
-        return results
+    def _build_stages(self, ingest=True):
+        """Build the ingest → map → impact → action stage graph from pipeline settings."""
+        # Summaries and action plans can share LLM requests, so those stages pull several items at once
+        default_batch = 8 if self.llm_client.batching_enabled else 1
+        ingest_batch_size = self._stage_settings("ingest").get("batch_size", default_batch)
+        action_batch_size = self._stage_settings("action").get("batch_size", default_batch)
+
+        stages = [
+            self._stage("map", self.mapping_agent.map_regulation, depends_on=["ingest"] if ingest else []),
+            self._stage("impact", self._evaluate_impact, depends_on=["map"]),
+            self._stage(
+                "action",
+                self._generate_actions if action_batch_size > 1 else self._generate_action,
+                depends_on=["impact"],
+                batch_size=action_batch_size
+            ),
+        ]
+        if ingest:
+            stages.insert(0, self._stage(
+                "ingest",
+                self._summarize_documents if ingest_batch_size > 1 else self._summarize_document,
+                batch_size=ingest_batch_size
+            ))
+        return stages
+
+    def _stage_settings(self, name):
+        return self.pipeline_config.get("stages", {}).get(name, {})
+
+    def _stage(self, name, func, depends_on=(), batch_size=1):
+        settings = self._stage_settings(name)
+        return Stage(
+            name,
+            func,
+            depends_on=depends_on,
+            workers=settings.get("workers", 1),
+            queue_size=self.pipeline_config.get("queue_size", 32),
+            retry=RetryPolicy(
+                max_attempts=settings.get("max_attempts", 3),
+                backoff_seconds=settings.get("backoff_seconds", 0.5)
+            ),
+            batch_size=batch_size,
+            batch_wait_seconds=settings.get("batch_wait_seconds", 0.0)
+        )
+
+    # Agents report LLM failures as placeholder text; raise so the scheduler retries them
+    def _summarize_document(self, doc):
+        summarized = self._summarize_documents([doc])[0]
+        if isinstance(summarized, Exception):
+            raise summarized
+        return summarized
+
+    def _summarize_documents(self, docs):
+        return [
+            RuntimeError(doc["regulation_text"]) if doc["regulation_text"] == "Error summarizing document." else doc
+            for doc in self.ingestion_agent.summarize_documents(docs)
+        ]
+
+    def _evaluate_impact(self, mapping):
+        impact = self.impact_agent.evaluate_impact(mapping)
+        if impact["impact_analysis"].startswith("Error"):
+            raise RuntimeError(impact["impact_analysis"])
+        return impact
+
+    def _generate_action(self, impact):
+        action = self._generate_actions([impact])[0]
+        if isinstance(action, Exception):
+            raise action
+        return action
+
+    def _generate_actions(self, impacts):
+        # Per-item errors let the scheduler retry just the failed plans, not the whole batch
+        return [
+            RuntimeError(action["recommended_actions"]) if action["recommended_actions"].startswith("Error") else action
+            for action in self.action_agent.generate_recommendations_batch(impacts)
+        ]
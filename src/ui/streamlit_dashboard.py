@@ -61,6 +61,12 @@ if not os.path.exists(OUTPUT_FILE):
 with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
     results = json.load(f)
 
+if results.get("llm_backend") == "mock":
+    st.error(
+        "🧪 These results were produced by the offline **mock** LLM backend. Summaries, priorities, owners "
+        "and deadlines are synthetic test data — do not use them as compliance analysis."
+    )
+
 # --- Helper: Clean up Markdown artifacts ---
 def clean_markdown(text: str) -> str:
     if not text:
@@ -87,11 +93,18 @@ def highlight_priorities(text: str) -> str:
     text = re.sub(r"\bLow\b", r"<span style='color:#27ae60; font-weight:bold;'>Low 🟢</span>", text)
     return text
 
+# --- Priority badges for structured action items ---
+PRIORITY_BADGES = {
+    "High": "<span style='color:#e74c3c; font-weight:bold;'>High 🔴</span>",
+    "Medium": "<span style='color:#f39c12; font-weight:bold;'>Medium 🟠</span>",
+    "Low": "<span style='color:#27ae60; font-weight:bold;'>Low 🟢</span>",
+}
+
 st.subheader("📊 Compliance Analysis Results")
 
 # --- Sidebar ---
 st.sidebar.header("Navigation")
-tabs = st.sidebar.radio("Choose a view:", ["Regulations", "Mappings", "Impact Analysis", "Recommended Actions"])
+tabs = st.sidebar.radio("Choose a view:", ["Regulations", "Mappings", "Impact Analysis", "Recommended Actions", "Controls by Owner"])
 
 # --- Tabs ---
 if tabs == "Regulations":
@@ -117,16 +130,100 @@ elif tabs == "Impact Analysis":
     st.header("🔍 Impact Summaries")
     for impact in results.get("impacts", []):
         with st.expander(impact.get("regulation_title", "Untitled Regulation"), expanded=False):
-            st.text_area("Impact Analysis", clean_markdown(impact.get("impact_analysis", "")), height=250)
+            assessment = impact.get("impact")
+            if not assessment:
+                # Older results only carry free-text analysis
+                st.text_area("Impact Analysis", clean_markdown(impact.get("impact_analysis", "")), height=250)
+                continue
+
+            st.markdown(f"**Impact Summary:** {assessment['impact_summary']}")
+            st.markdown("**Identified Gaps**")
+            for gap in assessment.get("gaps") or []:
+                controls = f" _(Controls: {', '.join(gap['control_ids'])})_" if gap.get("control_ids") else ""
+                st.markdown(f"• {gap['description']}{controls}")
+            st.markdown("**Recommended Focus Areas**")
+            for area in assessment.get("focus_areas") or []:
+                st.markdown(f"• {area}")
 
 elif tabs == "Recommended Actions":
     st.header("🧭 Compliance Recommendations")
-    for action in results.get("actions", []):
-        with st.expander(action.get("regulation_title", "Untitled Regulation"), expanded=False):
-            clean_text = clean_markdown(action.get("recommended_actions", ""))
-            highlighted = highlight_priorities(clean_text)
-            # Render as HTML for colored spans
-            st.markdown(highlighted, unsafe_allow_html=True)
+    actions = results.get("actions", [])
+    action_index = results.get("action_index")
+
+    if not action_index:
+        # Older results only carry free-text action plans
+        for action in actions:
+            with st.expander(action.get("regulation_title", "Untitled Regulation"), expanded=False):
+                clean_text = clean_markdown(action.get("recommended_actions", ""))
+                highlighted = highlight_priorities(clean_text)
+                # Render as HTML for colored spans
+                st.markdown(highlighted, unsafe_allow_html=True)
+    else:
+        # --- Filters resolved through the priority / owner index ---
+        priorities = [p for p in PRIORITY_BADGES if p in action_index["by_priority"]]
+        selected_priorities = st.sidebar.multiselect("Priority", priorities)
+        selected_owners = st.sidebar.multiselect("Owner", sorted(action_index["by_owner"]))
+
+        selected_refs = None
+        if selected_priorities:
+            selected_refs = {tuple(ref) for p in selected_priorities for ref in action_index["by_priority"][p]}
+        if selected_owners:
+            owner_refs = {tuple(ref) for o in selected_owners for ref in action_index["by_owner"][o]}
+            selected_refs = owner_refs if selected_refs is None else selected_refs & owner_refs
+
+        if selected_refs is None:
+            items_by_plan = {i: list(range(len(a.get("action_items") or []))) for i, a in enumerate(actions)}
+        else:
+            items_by_plan = {}
+            for plan_pos, item_pos in sorted(selected_refs):
+                items_by_plan.setdefault(plan_pos, []).append(item_pos)
+            st.caption(f"{len(selected_refs)} matching action items")
+
+        for plan_pos, item_positions in items_by_plan.items():
+            action = actions[plan_pos]
+            with st.expander(action.get("regulation_title", "Untitled Regulation"), expanded=False):
+                if not item_positions:
+                    st.write("_No structured actions available._")
+                for item_pos in item_positions:
+                    item = action["action_items"][item_pos]
+                    st.markdown(
+                        f"**{item['action']}**  \n"
+                        f"{PRIORITY_BADGES.get(item['priority'], item['priority'])} · "
+                        f"👤 {item['owner']} · 📅 {item['deadline']}  \n"
+                        f"_{item['rationale']}_",
+                        unsafe_allow_html=True
+                    )
+
+elif tabs == "Controls by Owner":
+    st.header("🛡️ Controls by Owner")
+    control_index = results.get("control_index") or {}
+    controls = control_index.get("controls") or {}
+
+    if not controls:
+        st.write("_No control index in these results. Refresh to generate it._")
+    else:
+        owner = st.sidebar.selectbox("Owner", sorted({c.get("owner", "N/A") for c in controls.values()}))
+        since = st.sidebar.date_input("Regulations changed since", value=None)
+
+        links = control_index.get("regulations_by_control") or {}
+        dates = control_index.get("regulation_dates") or {}
+        stale = set(control_index.get("stale_regulations") or [])
+        titles = {doc.get("id"): doc.get("title", doc.get("id")) for doc in results.get("regulatory_updates", [])}
+
+        for control_id, ctrl in sorted(controls.items()):
+            if ctrl.get("owner") != owner:
+                continue
+            regulations = [
+                reg for reg in links.get(control_id, [])
+                if not since or dates.get(reg, "") >= since.isoformat()
+            ]
+            with st.expander(f"{control_id} — {ctrl.get('name', '')}", expanded=bool(regulations)):
+                st.caption(f"Frequency: {ctrl.get('frequency', 'N/A')} · Last reviewed: {ctrl.get('last_reviewed', 'N/A')}")
+                if not regulations:
+                    st.write("_No mapped regulations._")
+                for reg in regulations:
+                    flag = " ⚠️ needs re-assessment" if reg in stale else ""
+                    st.markdown(f"• {titles.get(reg, reg)} _(changed {dates.get(reg, 'N/A')[:10]})_{flag}")
 
 # --- Footer ---
 st.markdown("---")
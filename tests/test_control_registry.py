@@ -0,0 +1,46 @@
+from core.control_registry import ControlRegistry
+
+
+def control(control_id, owner, last_reviewed="2024-08-01"):
+    return {"control_id": control_id, "name": f"Control {control_id}", "description": "...",
+            "owner": owner, "frequency": "Daily", "last_reviewed": last_reviewed}
+
+
+def registry():
+    reg = ControlRegistry()
+    reg.register(control("C001", "Financial Crime Compliance", "2024-09-15"))
+    reg.register(control("C002", "AML Operations"))
+    reg.register(control("C003", "AML Operations", "2023-01-01"))
+    reg.record_mapping("reg_old", ["C002"], changed_at="2024-05-01")
+    reg.record_mapping("reg_new", ["C002", "C001"], changed_at="2024-10-03")
+    return reg
+
+
+def test_owner_report_filters_on_regulation_change_date():
+    reg = registry()
+
+    assert reg.owner_report("AML Operations") == {"C002": ["reg_new", "reg_old"]}
+    assert reg.owner_report("AML Operations", since="2024-10-01") == {"C002": ["reg_new"]}
+
+
+def test_remapping_an_unchanged_regulation_keeps_its_date():
+    reg = registry()
+    reg.record_mapping("reg_old", ["C002"])
+
+    assert reg.owner_report("AML Operations", since="2024-10-01") == {"C002": ["reg_new"]}
+
+
+def test_update_control_reindexes_and_returns_dependents():
+    reg = registry()
+
+    assert reg.update_control("C002", owner="AML Ops Team") == {"reg_old", "reg_new"}
+    assert [c["control_id"] for c in reg.by_owner("AML Operations")] == ["C003"]
+    assert reg.stale_regulations() == {"reg_old", "reg_new"}
+    assert [c["control_id"] for c in reg.reviewed_between(end="2024-01-01")] == ["C003"]
+
+
+def test_round_trip_through_saved_results():
+    restored = ControlRegistry.from_dict(registry().to_dict())
+
+    assert restored.owner_report("AML Operations", since="2024-10-01") == {"C002": ["reg_new"]}
+    assert restored.regulations_for_control("C001") == ["reg_new"]
@@ -0,0 +1,79 @@
+import pytest
+
+from agents.action_agent import ActionAgent
+from agents.impact_agent import ImpactAgent
+from core.control_registry import ControlRegistry
+from core.llm_backends import LLMBackend, MockBackend
+from core.llm_client import LLMClient
+from core.schemas import ActionPlan, ImpactAssessment
+
+
+CONTROLS = [
+    {"control_id": "C001", "name": "Transaction monitoring", "description": "Daily AML alert review.",
+     "owner": "AML Operations", "frequency": "Daily", "last_reviewed": "2025-01-01"},
+    {"control_id": "C002", "name": "Sanctions screening", "description": "Screen customers at onboarding.",
+     "owner": "Financial Crime Compliance", "frequency": "Daily", "last_reviewed": "2025-02-01"},
+]
+
+
+def mapping(i=0):
+    return {
+        "regulation_title": f"FCA update {i}",
+        "regulation_text": f"Firms must strengthen AML monitoring ({i}). Reports are due within 30 days.",
+        "related_policies_controls": [
+            {"text": f"{ctrl['name']}: {ctrl['description']}", "metadata": {"control_id": ctrl["control_id"]}}
+            for ctrl in CONTROLS
+        ],
+    }
+
+
+def agents(batch_token_budget=0):
+    llm_client = LLMClient("test-model", None, batch_token_budget=batch_token_budget, backend="mock")
+    registry = ControlRegistry()
+    for ctrl in CONTROLS:
+        registry.register(ctrl)
+    return ImpactAgent(llm_client), ActionAgent(llm_client, registry)
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        LLMBackend()
+
+
+def test_mock_answers_agent_prompts_with_valid_json():
+    impact_agent, action_agent = agents()
+
+    impact = impact_agent.evaluate_impact(mapping())
+    actions = action_agent.generate_recommendations(impact)
+
+    assert ImpactAssessment.model_validate(impact["impact"])
+    assert {cid for gap in impact["impact"]["gaps"] for cid in gap["control_ids"]} <= {"C001", "C002"}
+    plan = ActionPlan.model_validate({"actions": actions["action_items"]})
+    assert {item.owner for item in plan.actions} <= {"AML Operations", "Financial Crime Compliance"}
+
+
+def test_mock_is_deterministic_for_the_same_prompt():
+    impact_agent, action_agent = agents()
+
+    first = action_agent.generate_recommendations(impact_agent.evaluate_impact(mapping()))
+    second = action_agent.generate_recommendations(impact_agent.evaluate_impact(mapping()))
+
+    assert first == second
+    assert MockBackend().invoke("Some prompt. With text.") == MockBackend().invoke("Some prompt. With text.")
+
+
+def test_mock_answers_batched_action_prompts():
+    impact_agent, action_agent = agents(batch_token_budget=100_000)
+    impacts = [impact_agent.evaluate_impact(mapping(i)) for i in range(4)]
+    backend = action_agent.llm_client.backend
+    calls = []
+    invoke = backend.invoke
+    backend.invoke = lambda prompt: calls.append(prompt) or invoke(prompt)
+
+    results = action_agent.generate_recommendations_batch(impacts)
+
+    # One batched request, and every item splits out as a valid plan
+    assert len(calls) == 1
+    assert [r["regulation_title"] for r in results] == [f"FCA update {i}" for i in range(4)]
+    assert all(r["action_items"] and not r["recommended_actions"].startswith("Error") for r in results)
+    assert results == action_agent.generate_recommendations_batch(impacts)
@@ -0,0 +1,107 @@
+import pytest
+
+from core.llm_backends import BATCH_ITEM_MARKER, BATCH_ITEM_PATTERN, LLMBackend
+from core.llm_client import LLMClient
+
+
+class EchoBackend(LLMBackend):
+    """Answers each task with "answer: <task>"; batched replies can be rewritten to simulate bad output."""
+
+    name = "echo"
+
+    def __init__(self, rewrite_batch=None):
+        self.prompts = []
+        self.rewrite_batch = rewrite_batch
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        parts = BATCH_ITEM_PATTERN.split(prompt)
+        if len(parts) == 1:
+            return f"answer: {prompt}"
+
+        answers = [(int(index), f"answer: {task.strip()}") for index, task in zip(parts[1::2], parts[2::2])]
+        if self.rewrite_batch:
+            answers = self.rewrite_batch(answers)
+        return "\n\n".join(f"{BATCH_ITEM_MARKER.format(index=index)}\n{answer}" for index, answer in answers)
+
+    @property
+    def batched_calls(self):
+        return sum(1 for prompt in self.prompts if BATCH_ITEM_PATTERN.search(prompt))
+
+
+def client(backend=None, budget=10_000, max_items=8):
+    return LLMClient("test-model", None, batch_token_budget=budget, backend=backend or EchoBackend(),
+                     batch_max_items=max_items)
+
+
+def reply(*items):
+    return "\n".join(f"{BATCH_ITEM_MARKER.format(index=index)}\n{answer}" for index, answer in items)
+
+
+def test_plan_batches_counts_expected_output_and_caps_items():
+    prompts = ["x" * 396] * 6  # ~100 tokens each
+
+    assert client(budget=300)._plan_batches(prompts) == [[0, 1, 2], [3, 4, 5]]
+    assert client(budget=300)._plan_batches(prompts, output_tokens=50) == [[0, 1], [2, 3], [4, 5]]
+    assert client(budget=10_000, max_items=4)._plan_batches(prompts) == [[0, 1, 2, 3], [4, 5]]
+    # An item larger than the budget still gets a group of its own
+    assert client(budget=50)._plan_batches(prompts[:2]) == [[0], [1]]
+
+
+@pytest.mark.parametrize("response, expected", [
+    (reply((2, "b"), (1, "a"), (3, "c")), ["a", "b", "c"]),           # out of order
+    (reply((1, "a"), (3, "c")), ["a", None, "c"]),                    # missing
+    (reply((1, "a"), (2, "b"), (3, "c"), (4, "d")), ["a", "b", "c"]),  # extra
+    (reply((1, "a"), (2, ""), (3, "c")), ["a", None, "c"]),           # empty
+    (reply((1, "a"), (1, "a2"), (2, "b"), (3, "c")), [None, "b", "c"]),  # repeated
+    (reply((1, "a"), (2, "b, cut of")), ["a", None, None]),           # cut off before the last item
+    ("Error: LLM request failed.", [None, None, None]),
+])
+def test_split_batch_response(response, expected):
+    assert LLMClient._split_batch_response(response, 3) == expected
+
+
+def test_only_invalid_batched_answers_are_re_requested():
+    def break_second(answers):
+        return [(index, "" if index == 2 else answer) for index, answer in answers]
+
+    backend = EchoBackend(rewrite_batch=break_second)
+    prompts = ["first", "second", "third"]
+
+    results = client(backend).generate_batch(prompts, validate=lambda answer: answer.startswith("answer"))
+
+    assert results == ["answer: first", "answer: second", "answer: third"]
+    assert backend.prompts[1:] == ["second"]
+
+
+def test_validate_rejects_individual_answers():
+    backend = EchoBackend()
+    prompts = ["keep", "reject", "keep too"]
+
+    results = client(backend).generate_batch(prompts, validate=lambda answer: "reject" not in answer)
+
+    # The rejected item is asked again on its own; the valid ones are not
+    assert backend.prompts[1:] == ["reject"]
+    assert results[0] == "answer: keep" and results[2] == "answer: keep too"
+
+
+def test_summarize_batch_keeps_answers_from_a_truncated_reply():
+    backend = EchoBackend(rewrite_batch=lambda answers: answers[:3])
+    texts = [f"Document {i}." for i in range(5)]
+
+    results = client(backend, max_items=5).summarize_batch(texts, max_length=50)
+
+    assert all(result.startswith("answer: Summarize") and text in result for text, result in zip(texts, results))
+    # One batched call, then items 3 (possibly cut off), 4 and 5 individually
+    assert backend.batched_calls == 1
+    assert len(backend.prompts) == 4
+
+
+def test_summarize_batch_without_budget_makes_one_call_per_text():
+    backend = EchoBackend()
+
+    results = client(backend, budget=0).summarize_batch(["a", "b"], max_length=50)
+
+    assert len(results) == 2
+    assert backend.batched_calls == 0
+    assert len(backend.prompts) == 2
@@ -0,0 +1,157 @@
+import threading
+import time
+
+from orchestration.scheduler import CheckpointStore, RetryPolicy, Stage, StageScheduler
+
+
+NO_WAIT = RetryPolicy(max_attempts=3, backoff_seconds=0)
+
+
+def items(n):
+    return [{"id": f"r{i}", "value": i} for i in range(n)]
+
+
+def test_items_flow_through_dependent_stages():
+    stages = [
+        Stage("double", lambda item: item["value"] * 2, workers=3, queue_size=2),
+        Stage("square", lambda value: value ** 2, depends_on=["double"], workers=2),
+        Stage("join", lambda inputs: (inputs["double"], inputs["square"]), depends_on=["double", "square"]),
+    ]
+
+    results, failures = StageScheduler(stages).run(items(20))
+
+    assert failures == {}
+    assert results["join"] == {f"r{i}": (2 * i, 4 * i * i) for i in range(20)}
+
+
+def test_failing_item_is_retried_then_recorded_without_blocking_others():
+    calls = []
+
+    def flaky(item):
+        calls.append(item["id"])
+        if item["id"] == "r3":
+            raise RuntimeError("boom")
+        return item["value"]
+
+    stages = [
+        Stage("first", flaky, retry=NO_WAIT),
+        Stage("second", lambda value: value + 1, depends_on=["first"]),
+    ]
+
+    results, failures = StageScheduler(stages).run(items(5))
+
+    assert failures == {"r3": {"stage": "first", "error": "boom"}}
+    assert calls.count("r3") == 3
+    assert "r3" not in results["second"]
+    assert results["second"] == {"r0": 1, "r1": 2, "r2": 3, "r4": 5}
+
+
+def test_batched_stage_fails_and_retries_only_the_bad_item():
+    calls = []
+    lock = threading.Lock()
+
+    def batched(values):
+        with lock:
+            calls.append(len(values))
+        return [RuntimeError("invalid plan") if value == 5 else value * 10 for value in values]
+
+    stages = [
+        Stage("first", lambda item: item["value"]),
+        Stage("batched", batched, depends_on=["first"], batch_size=8, retry=NO_WAIT),
+    ]
+
+    results, failures = StageScheduler(stages).run(items(16))
+
+    assert failures == {"r5": {"stage": "batched", "error": "invalid plan"}}
+    assert results["batched"] == {f"r{i}": i * 10 for i in range(16) if i != 5}
+    # 16 first attempts plus two single-item retries of the bad one
+    assert sum(calls) == 18
+
+
+def test_batched_stage_waits_for_streamed_items_to_fill_batches():
+    sizes = []
+    lock = threading.Lock()
+
+    def slow_first(item):
+        time.sleep(0.01)
+        return item["value"]
+
+    def batched(values):
+        with lock:
+            sizes.append(len(values))
+        return values
+
+    stages = [
+        Stage("first", slow_first),
+        Stage("batched", batched, depends_on=["first"], batch_size=8, batch_wait_seconds=1.0),
+    ]
+
+    results, failures = StageScheduler(stages).run(items(16))
+
+    assert failures == {}
+    assert len(results["batched"]) == 16
+    # Items trickle in one at a time, yet the stage still sends full batches
+    assert sizes == [8, 8]
+
+
+def test_error_after_processing_is_recorded_as_failure():
+    def on_result(stage, key, result):
+        if key == "r1":
+            raise RuntimeError("sink down")
+
+    results, failures = StageScheduler([Stage("only", lambda item: item["value"])]).run(items(3), on_result=on_result)
+
+    assert failures == {"r1": {"stage": "only", "error": "sink down"}}
+    assert set(results["only"]) == {"r0", "r1", "r2"}
+
+
+def test_resume_after_crash_reuses_finished_and_partial_items(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    calls = {"first": [], "second": []}
+
+    def first(item):
+        calls["first"].append(item["id"])
+        return item["value"]
+
+    def second(value):
+        calls["second"].append(value)
+        return value
+
+    def crashing_second(value):
+        if value == 2:
+            raise RuntimeError("crash")
+        return value
+
+    # First run dies before results are saved elsewhere: r0 and r1 finished, r2 only got through "first"
+    stages = [Stage("first", first), Stage("second", crashing_second, depends_on=["first"], retry=NO_WAIT)]
+    _, failures = StageScheduler(stages, checkpoint=CheckpointStore(path)).run(items(3))
+    assert set(failures) == {"r2"}
+    assert CheckpointStore(path).get("r0") == {"first": 0, "second": 0}
+    assert set(CheckpointStore(path).get("r2")) == {"first"}
+
+    calls["first"].clear()
+    stages = [Stage("first", first), Stage("second", second, depends_on=["first"])]
+    reported = []
+    results, failures = StageScheduler(stages, checkpoint=CheckpointStore(path)).run(
+        items(3), on_result=lambda stage, key, result: reported.append((stage, key))
+    )
+
+    assert failures == {}
+    # Restored results are reported to streaming consumers as well
+    assert sorted(reported) == sorted((stage, f"r{i}") for stage in ("first", "second") for i in range(3))
+    assert calls["first"] == []
+    assert calls["second"] == [2]
+    assert results["second"] == {"r0": 0, "r1": 1, "r2": 2}
+
+
+def test_checkpoint_key_changes_prevent_stale_resume(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    checkpoint = CheckpointStore(path)
+    checkpoint.save("r0:old", "first", 100)
+
+    stages = [Stage("first", lambda item: item["value"]), Stage("second", lambda value: value, depends_on=["first"])]
+    results, _ = StageScheduler(stages, checkpoint=checkpoint).run(
+        items(1), checkpoint_key=lambda item: f"{item['id']}:new"
+    )
+
+    assert results["second"] == {"r0": 0}
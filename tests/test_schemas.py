@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from core.schemas import ActionPlan, ImpactAssessment, match_owner, parse_structured_output
+
+
+def plan(*items):
+    return json.dumps({"actions": list(items)})
+
+
+def item(priority, action="Update KYC policy", owner="Compliance Team"):
+    return {"action": action, "priority": priority, "owner": owner,
+            "deadline": "Q1 2025", "rationale": "New FCA guidance"}
+
+
+OWNERS = ["AML Operations", "Financial Crime Compliance", "Retail Compliance", "Operational Resilience"]
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("high", "High"),
+    ("Critical", "High"),
+    ("High priority", "High"),
+    ("P1 - urgent", "High"),
+    ("Moderate", "Medium"),
+    ("low", "Low"),
+])
+def test_priority_variants_are_normalised(raw, expected):
+    parsed = parse_structured_output(plan(item(raw)), ActionPlan)
+
+    assert parsed.actions[0].priority == expected
+
+
+def test_invalid_item_is_dropped_without_rejecting_the_plan():
+    parsed = parse_structured_output(plan(item("High"), item("Whenever"), {"action": "missing fields"}), ActionPlan)
+
+    assert [a.priority for a in parsed.actions] == ["High"]
+
+
+@pytest.mark.parametrize("items", [[item("Whenever")], []])
+def test_plan_with_no_valid_items_is_rejected(items):
+    with pytest.raises(ValueError):
+        parse_structured_output(plan(*items), ActionPlan)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("AML Operations", "AML Operations"),
+    ("AML Ops team", "AML Operations"),
+    ("the aml operations department", "AML Operations"),
+    ("Financial Crime", "Financial Crime Compliance"),
+    ("Op Resilience", "Operational Resilience"),
+    ("Compliance", None),  # matches two owners equally
+    ("Board", None),
+])
+def test_owner_variants_match_known_owners(raw, expected):
+    assert match_owner(raw, OWNERS) == expected
+
+
+def test_owners_are_normalised_and_unknown_owners_dropped():
+    raw = plan(item("High", owner="AML Ops team"), item("Low", owner="Marketing"))
+
+    parsed = parse_structured_output(raw, ActionPlan, context={"owners": OWNERS})
+
+    assert [a.owner for a in parsed.actions] == ["AML Operations"]
+    # Without known owners the answer is kept as written
+    assert parse_structured_output(raw, ActionPlan).actions[1].owner == "Marketing"
+
+
+def test_gaps_keep_only_retrieved_control_ids():
+    raw = json.dumps({"impact_summary": "s", "gaps": [{"description": "d", "control_ids": ["C001", "C999"]}]})
+
+    parsed = parse_structured_output(raw, ImpactAssessment, context={"control_ids": {"C001"}})
+
+    assert parsed.gaps[0].control_ids == ["C001"]
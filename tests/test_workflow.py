@@ -0,0 +1,75 @@
+import pytest
+
+from core.control_registry import ControlRegistry
+from core.llm_client import LLMClient
+from orchestration.workflow import Workflow
+
+
+def control(control_id, owner):
+    return {"control_id": control_id, "name": f"Control {control_id}", "description": "AML monitoring",
+            "owner": owner, "frequency": "Daily", "last_reviewed": "2025-01-01"}
+
+
+class FakeRetriever:
+    """In-memory stand-in for the Chroma retriever; every search returns all stored controls."""
+
+    def __init__(self, controls):
+        self.controls = {ctrl["control_id"]: ctrl for ctrl in controls}
+        self.deleted = []
+
+    def add_document(self, doc_id, text, metadata=None):
+        pass
+
+    def search(self, query, top_k=3):
+        controls = list(self.controls.values())[:top_k]
+        return {
+            "documents": [[f"{ctrl['name']}: {ctrl['description']}" for ctrl in controls]],
+            "metadatas": [[{"type": "control", "owner": ctrl["owner"], "control_id": ctrl["control_id"]}
+                           for ctrl in controls]],
+        }
+
+    def upsert_control(self, ctrl):
+        self.controls[ctrl["control_id"]] = ctrl
+
+    def delete_controls(self, control_ids):
+        for control_id in control_ids:
+            self.deleted.append(control_id)
+            self.controls.pop(control_id, None)
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    updates = tmp_path / "src" / "data" / "regulatory_updates"
+    updates.mkdir(parents=True)
+    (tmp_path / "src" / "data" / "output").mkdir()
+    for i in range(3):
+        (updates / f"reg{i}.txt").write_text(f"Regulation {i} tightens AML monitoring. Firms must report within 30 days.")
+    monkeypatch.setattr(Workflow, "OUTPUT_PATH", str(tmp_path / "results.json"))
+    return tmp_path
+
+
+def workflow(controls):
+    registry = ControlRegistry()
+    for ctrl in controls:
+        registry.register(ctrl)
+    llm_client = LLMClient("test-model", None, backend="mock")
+    return Workflow(llm_client, FakeRetriever(controls), control_registry=registry)
+
+
+def test_deleted_control_is_removed_and_its_regulations_reassessed(workspace):
+    first = workflow([control("C001", "AML Operations"), control("C002", "Financial Crime Compliance")])
+    results = first.run()
+    assert results["failures"] == {}
+    assert results["control_index"]["regulations_by_control"]["C002"]
+
+    # A later process loads the controls from disk: C002 was deleted and C003 added
+    second = workflow([control("C001", "AML Operations"), control("C003", "Retail Compliance")])
+    results = second.reassess_changed_controls()
+
+    assert second.retriever.deleted == ["C002"]
+    assert "C002" not in results["control_index"]["controls"]
+    assert "C002" not in results["control_index"]["regulations_by_control"]
+    cited = {item["metadata"]["control_id"] for m in results["mappings"] for item in m["related_policies_controls"]}
+    assert "C002" not in cited
+    assert len(results["actions"]) == 3